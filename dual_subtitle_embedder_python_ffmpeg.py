@@ -6,10 +6,17 @@ Dual-Subtitle Embedder (English above Vietnamese, both near bottom)
 - Compression modes: Normal / Smaller / Smallest (+ optional 720p downscale)
 """
 
+import functools
+import json
 import os
 import platform
+import queue
+import re
+import select
 import shutil
+import signal
 import subprocess
+import tempfile
 import threading
 import time
 from pathlib import Path
@@ -38,9 +45,42 @@ VI_MARGIN_V = 24   # Vietnamese very near bottom
 # ======= Helpers =======
 VID_EXTS = {".mp4", ".mkv", ".mov", ".avi", ".m4v"}
 
+# Fragmented MP4: streamable from byte 0 without faststart's whole-file
+# rewrite pass to relocate the moov atom.
+MOV_FLAGS = "+frag_keyframe+empty_moov+default_base_moof"
 
+# Tcl drop lists: brace-quoted paths (may contain spaces) or bare tokens.
+_DND_TOKEN = re.compile(r"\{([^}]*)\}|(\S+)")
+
+# Pre-flight SRT checks: a real SRT shows a timestamp line early on, and the
+# Vietnamese track is recognizable by its diacritics.
+_SRT_TS = re.compile(rb"\d{2}:\d{2}:\d{2},\d{3} --> \d{2}:\d{2}:\d{2},\d{3}")
+_VI_DIACRITICS = re.compile(
+    "[ăâêôơưđạảấầẩẫậắằẳẵặẹẻẽếềểễệỉịọỏốồổỗộớờởỡợụủứừửữựỳỵỷỹ]", re.IGNORECASE
+)
+
+
+def srt_looks_valid(srt_path: str) -> bool:
+    """Cheap pre-flight check: a timestamp line within the first 64 KiB."""
+    try:
+        head = Path(srt_path).read_bytes()[:65536]
+    except OSError:
+        return False
+    return bool(_SRT_TS.search(head))
+
+
+def srt_is_vietnamese(srt_path: str) -> bool:
+    """Heuristic: Vietnamese diacritics anywhere in the first 64 KiB."""
+    try:
+        head = Path(srt_path).read_bytes()[:65536].decode("utf-8", "ignore")
+    except OSError:
+        return False
+    return bool(_VI_DIACRITICS.search(head))
+
+
+@functools.lru_cache(maxsize=1)
 def ffmpeg_path_guess() -> str:
-    """Find ffmpeg on PATH, or common Windows location."""
+    """Find ffmpeg on PATH, or common Windows location (resolved once per run)."""
     p = shutil.which("ffmpeg")
     if p:
         return p
@@ -51,74 +91,444 @@ def ffmpeg_path_guess() -> str:
     raise FileNotFoundError("FFmpeg executable not found. Install it or add to PATH.")
 
 
+@functools.lru_cache(maxsize=1)
+def ffprobe_path_guess() -> str:
+    """Find ffprobe on PATH, or next to the ffmpeg binary."""
+    p = shutil.which("ffprobe")
+    if p:
+        return p
+    exe = "ffprobe.exe" if platform.system() == "Windows" else "ffprobe"
+    sibling = Path(ffmpeg_path_guess()).with_name(exe)
+    if sibling.exists():
+        return str(sibling)
+    raise FileNotFoundError("FFprobe executable not found. Install it or add to PATH.")
+
+
+@functools.lru_cache(maxsize=8)
+def _probe_cached(path: str, mtime: float) -> dict:
+    out = subprocess.run(
+        [ffprobe_path_guess(), "-v", "error", "-print_format", "json",
+         "-show_format", "-show_streams", path],
+        capture_output=True, text=True, timeout=15,
+    ).stdout
+    return json.loads(out or "{}")
+
+
+def probe(path: str) -> dict:
+    """Full ffprobe format+streams JSON for path, cached by (path, mtime); {} on failure.
+
+    One ffprobe process serves every consumer (audio-copy decision, embedded
+    subtitle detection, duration for the progress bar) instead of a separate
+    probe per question.
+    """
+    try:
+        return _probe_cached(path, os.path.getmtime(path))
+    except Exception:
+        return {}
+
+
+def probe_duration(video: str):
+    """Container duration in seconds, or None if unknown."""
+    try:
+        return float(probe(video)["format"]["duration"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def probe_embedded_subtitles(video: str):
+    """Return (en_si, vi_si) subtitle-stream indices for EN/VI tracks embedded in the container, or None.
+
+    Indices are relative to the subtitle streams (what the `subtitles` filter's
+    `si=` option expects), not absolute stream indices.
+    """
+    subs = [s for s in probe(video).get("streams", []) if s.get("codec_type") == "subtitle"]
+    en_si = vi_si = None
+    for si, stream in enumerate(subs):
+        lang = stream.get("tags", {}).get("language", "").lower()
+        if en_si is None and lang in ("en", "eng"):
+            en_si = si
+        elif vi_si is None and lang in ("vi", "vie"):
+            vi_si = si
+    if en_si is None or vi_si is None:
+        return None
+    return en_si, vi_si
+
+
+def probe_audio(video: str):
+    """Return (codec_name, bit_rate) for the first audio stream; (None, None) if unknown."""
+    for stream in probe(video).get("streams", []):
+        if stream.get("codec_type") == "audio":
+            rate = str(stream.get("bit_rate", ""))
+            return stream.get("codec_name"), int(rate) if rate.isdigit() else None
+    return None, None
+
+
+# Hardware encoders we know how to drive, in order of preference.
+HW_ENCODER_CANDIDATES = ("hevc_nvenc", "h264_nvenc", "h264_qsv", "h264_videotoolbox")
+_hw_encoders = None  # populated lazily by detect_hw_encoders()
+
+
+def detect_hw_encoders() -> set:
+    """Probe `ffmpeg -encoders` once and cache which hardware encoders are available."""
+    global _hw_encoders
+    if _hw_encoders is None:
+        found = set()
+        try:
+            out = subprocess.run(
+                [ffmpeg_path_guess(), "-hide_banner", "-encoders"],
+                capture_output=True, text=True, timeout=15,
+            ).stdout
+            names = {line.split()[1] for line in out.splitlines() if len(line.split()) >= 2}
+            found = set(HW_ENCODER_CANDIDATES) & names
+        except Exception:
+            pass
+        _hw_encoders = found
+    return _hw_encoders
+
+
+# Characters that need escaping inside a subtitles/ass filter argument.
+_SUB_PATH_ESCAPES = str.maketrans({"\\": "\\\\", ":": r"\:", "'": r"\'"})
+
+
 def ffmpeg_escape_for_subtitles(path: str) -> str:
-    p = path.replace("\\", "\\\\").replace(":", r"\:")
-    p = p.replace("'", r"\'")
-    return f"'{p}'"
+    return f"'{path.translate(_SUB_PATH_ESCAPES)}'"
 
 
-def build_filter_complex(en_srt: str, vi_srt: str, downscale_720: bool, font_size: int, en_margin: int, vi_margin: int) -> str:
-    style_common = f"FontName={DEFAULT_FONT},Fontsize={font_size},Outline={DEFAULT_OUTLINE},Shadow={DEFAULT_SHADOW}"
-    en = ffmpeg_escape_for_subtitles(en_srt)
-    vi = ffmpeg_escape_for_subtitles(vi_srt)
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+WrapStyle: 0
 
-    p1 = (
-        f"[0:v]subtitles={en}:charenc=UTF-8:force_style='Alignment=2,MarginV={en_margin},{style_common}'[v1]"
-    )
-    p2 = (
-        f"[v1]subtitles={vi}:charenc=UTF-8:force_style='Alignment=2,MarginV={vi_margin},{style_common}'[v2]"
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: EN,{font},{size},&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,{outline},{shadow},2,10,10,{en_margin},1
+Style: VI,{font},{size},&H00FFFFFF,&H000000FF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,{outline},{shadow},2,10,10,{vi_margin},1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+# One cue per match: timestamp line, then text up to a blank line or EOF.
+# A single sweep over the raw bytes replaces the old per-block splitting.
+_SRT_CUE = re.compile(
+    rb"(\d{2}:\d{2}:\d{2},\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2},\d{3})[^\r\n]*\r?\n"
+    rb"(.*?)(?=\r?\n\r?\n|\r?\n?\Z)",
+    re.DOTALL,
+)
+
+
+def _srt_time_to_ass(ts: bytes) -> bytes:
+    """Convert an SRT timestamp `HH:MM:SS,mmm` to ASS `H:MM:SS.cc`."""
+    h, m, rest = ts.split(b":")
+    s, ms = rest.split(b",")
+    return b"%d:%s:%s.%02d" % (int(h), m, s, int(ms) // 10)
+
+
+def parse_srt_cues(srt_path: str):
+    """Return (start, end, text) byte cues with ASS timestamps and \\N line breaks."""
+    data = Path(srt_path).read_bytes()
+    if data.startswith(b"\xef\xbb\xbf"):
+        data = data[3:]
+    cues = []
+    for start, end, body in _SRT_CUE.findall(data):
+        body = body.replace(b"\r\n", b"\\N").replace(b"\n", b"\\N").replace(b"\r", b"\\N")
+        cues.append((_srt_time_to_ass(start), _srt_time_to_ass(end), body))
+    return cues
+
+
+def merge_srts_to_ass(en_srt: str, vi_srt: str, font_size: int, en_margin: int, vi_margin: int) -> str:
+    """Merge both SRTs into one temp .ass file (styles EN/VI) so FFmpeg burns them in a single libass pass."""
+    header = ASS_HEADER.format(
+        font=DEFAULT_FONT, size=font_size, outline=DEFAULT_OUTLINE, shadow=DEFAULT_SHADOW,
+        en_margin=en_margin, vi_margin=vi_margin,
     )
+    # Assemble everything in one buffer and write it with a single syscall.
+    buf = bytearray(header.encode("utf-8"))
+    for style, srt in ((b"EN", en_srt), (b"VI", vi_srt)):
+        for start, end, body in parse_srt_cues(srt):
+            buf += b"Dialogue: 0,%s,%s,%s,,0,0,0,,%s\n" % (start, end, style, body)
+    fd, ass_path = tempfile.mkstemp(suffix=".ass", prefix="dualsub_")
+    with os.fdopen(fd, "wb") as f:
+        f.write(buf)
+    return ass_path
+
+
+def _filter_prefix(downscale_720: bool, cuda: bool) -> str:
+    """Leading filters before the subtitle burn.
+
+    With CUDA decode the frames arrive in device memory: scale on-device
+    (scale_cuda) so only output-sized frames cross PCIe, then download once
+    for the libass burn — libass has no CUDA path, and NVENC accepts
+    system-memory frames directly.
+    """
+    if cuda:
+        return ("scale_cuda=-2:720," if downscale_720 else "") + "hwdownload,format=nv12,"
+    return "scale=-2:720," if downscale_720 else ""
+
+
+def build_embedded_filter_complex(video: str, en_si: int, vi_si: int, downscale_720: bool, font_size: int, en_margin: int, vi_margin: int, cuda: bool = False) -> str:
+    """Burn EN/VI tracks straight from the source container, skipping the SRT demux round trip."""
+    style_common = f"FontName={DEFAULT_FONT},Fontsize={font_size},Outline={DEFAULT_OUTLINE},Shadow={DEFAULT_SHADOW}"
+    src = ffmpeg_escape_for_subtitles(video)
+    pre = _filter_prefix(downscale_720, cuda)
+    p1 = f"subtitles={src}:si={en_si}:force_style='Alignment=2,MarginV={en_margin},{style_common}'"
+    p2 = f"subtitles={src}:si={vi_si}:force_style='Alignment=2,MarginV={vi_margin},{style_common}'"
+    return f"[0:v]{pre}{p1},{p2}[vout]"
+
+
+def build_filter_complex(ass_path: str, downscale_720: bool, cuda: bool = False) -> str:
+    """Single-chain libass burn of the merged ASS track, with optional 720p downscale.
+
+    Scaling runs before the burn so libass rasterizes at the output
+    resolution — far fewer pixels to blend per frame when downscaling.
+    """
+    ass = f"ass={ffmpeg_escape_for_subtitles(ass_path)}"
+    return f"[0:v]{_filter_prefix(downscale_720, cuda)}{ass}[vout]"
 
-    # Optional scale to 720p height preserving aspect (for size reduction)
-    p3 = "[v2]scale=-2:720[vout]" if downscale_720 else "[v2]copy[vout]"  # copy is a no-op passthrough label
-    # Build; if copy, just relabel via format filter to keep a legal chain
-    if downscale_720:
-        chain = f"{p1};{p2};{p3}"
-    else:
-        # replace copy with a trivial format to create vout
-        chain = f"{p1};{p2};[v2]format=yuv420p[vout]"
-    return chain
 
+_sfe_supported = None  # populated lazily by nvenc_supports_split_encoding()
 
-def build_encode_args(mode: str):
-    """Return (video_codec_args, audio_codec_args) for a given compression mode."""
+
+def nvenc_supports_split_encoding() -> bool:
+    """True when the GPU generation (Ada or newer) supports NVENC split-frame encoding."""
+    global _sfe_supported
+    if _sfe_supported is None:
+        names = ""
+        try:
+            names = subprocess.run(
+                ["nvidia-smi", "--query-gpu=name", "--format=csv,noheader"],
+                capture_output=True, text=True, timeout=10,
+            ).stdout.lower()
+        except Exception:
+            pass
+        _sfe_supported = any(gen in names for gen in ("rtx 40", "rtx 50", " ada", "blackwell", " l4", " l40"))
+    return _sfe_supported
+
+
+# x264/x265 speed presets, fastest first (shown in the GUI; "Auto" picks per mode).
+SW_PRESETS = ("ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow")
+
+
+def _hw_h264_args(quality: int):
+    """Hardware H.264 encoder args, or None when only software is available."""
+    hw = detect_hw_encoders()
+    if "h264_nvenc" in hw:
+        return ["-c:v", "h264_nvenc", "-preset", "p5", "-rc", "vbr", "-cq", str(quality)]
+    if "h264_qsv" in hw:
+        return ["-c:v", "h264_qsv", "-global_quality", str(quality)]
+    if "h264_videotoolbox" in hw:
+        return ["-c:v", "h264_videotoolbox", "-q:v", "65"]
+    return None
+
+
+def build_encode_args(mode: str, preset: str = ""):
+    """Return (video_codec_args, audio_codec_args) for a given compression mode.
+
+    `preset` overrides the per-mode x264/x265 speed preset; empty or "Auto"
+    keeps the mode default. Hardware encoders use their own preset ladder.
+    """
     mode = mode.lower()
+    preset = preset.lower() if preset.lower() in SW_PRESETS else ""
     if mode == "smallest":
-        return ["-c:v", "libx265", "-preset", "medium", "-crf", "28"], ["-c:a", "aac", "-b:a", "128k"]
+        if "hevc_nvenc" in detect_hw_encoders():
+            v = ["-c:v", "hevc_nvenc", "-preset", "p5", "-tune", "hq", "-rc", "vbr", "-cq", "28"]
+            if nvenc_supports_split_encoding():
+                # Split-frame encoding spreads one frame across both NVENC engines
+                # (Ada/Blackwell); big throughput win at 4K+ in single-pass modes.
+                v += ["-split_encode_mode", "1"]
+            return v, ["-c:a", "aac", "-b:a", "128k"]
+        # One params bundle instead of separate flags; the long keyint cuts
+        # keyframe overhead on long videos, the rest are x265 knobs FFmpeg's
+        # generic options cannot reach.
+        v = ["-c:v", "libx265", "-preset", preset or "fast",
+             "-x265-params", "crf=26:keyint=250:min-keyint=25:bframes=8:aq-mode=3:psy-rd=2.0"]
+        return v, ["-c:a", "aac", "-b:a", "128k"]
     if mode == "smaller":
-        return ["-c:v", "libx264", "-preset", "medium", "-crf", "24"], ["-c:a", "aac", "-b:a", "160k"]
+        v = _hw_h264_args(23) or [
+            "-c:v", "libx264", "-preset", preset or "veryfast",
+            "-x264-params", "crf=23:keyint=250:bframes=6:ref=4",
+        ]
+        return v, ["-c:a", "aac", "-b:a", "160k"]
     # normal
-    return ["-c:v", "libx264", "-preset", "medium", "-crf", "18"], ["-c:a", "aac", "-b:a", "192k"]
+    v = _hw_h264_args(18) or ["-c:v", "libx264", "-preset", preset or "medium", "-crf", "18"]
+    return v, ["-c:a", "aac", "-b:a", "192k"]
+
+
+def ffmpeg_time_to_seconds(ts: str):
+    """Parse FFmpeg's `HH:MM:SS.mm` progress stamp into seconds, or None."""
+    try:
+        h, m, s = ts.split(":")
+        return int(h) * 3600 + int(m) * 60 + float(s)
+    except ValueError:
+        return None
+
+
+def _scan_progress(buf: bytes, progress_cb) -> bytes:
+    """Report `time=` stamps from completed lines in buf; return the trailing partial line."""
+    lines = re.split(b"[\r\n]", buf)
+    rest = lines.pop()
+    if progress_cb:
+        for line in lines:
+            if b"time=" in line:
+                try:
+                    t = line.split(b"time=")[1].split()[0].decode("ascii", "ignore")
+                    progress_cb(t)
+                except Exception:
+                    pass
+    return rest
+
+
+def _pump_progress_poll(stderr, progress_cb):
+    """Drain FFmpeg stderr via select.poll, reading only when data is ready."""
+    poller = select.poll()
+    poller.register(stderr, select.POLLIN | select.POLLHUP)
+    fd = stderr.fileno()
+    buf = b""
+    while True:
+        if not poller.poll(200):
+            continue
+        chunk = os.read(fd, 4096)
+        if not chunk:
+            break
+        buf = _scan_progress(buf + chunk, progress_cb)
+
+
+def _pump_progress_thread(stderr, progress_cb):
+    """Windows fallback: a reader thread feeds a queue so reads never stall mid-line."""
+    chunks = queue.Queue()
+
+    def reader():
+        while True:
+            chunk = stderr.read(4096)
+            chunks.put(chunk)
+            if not chunk:
+                break
+
+    threading.Thread(target=reader, daemon=True).start()
+    buf = b""
+    while True:
+        try:
+            chunk = chunks.get(timeout=0.2)
+        except queue.Empty:
+            continue
+        if not chunk:
+            break
+        buf = _scan_progress(buf + chunk, progress_cb)
 
 
-def run_ffmpeg(video: str, en_srt: str, vi_srt: str, out_path: str, mode: str, downscale_720: bool, font_size: int, en_margin: int, vi_margin: int, progress_cb=None) -> int:
+def _popen_kwargs() -> dict:
+    """Spawn options: no console flash on Windows; own session on POSIX so a
+    Ctrl-C in the parent terminal does not take FFmpeg down with it."""
+    if platform.system() == "Windows":
+        return {"creationflags": subprocess.CREATE_NO_WINDOW}
+    return {"start_new_session": True}
+
+
+def _run_ffmpeg_cmd(cmd, progress_cb, proc_cb=None, cwd=None) -> int:
+    """Spawn an FFmpeg command, pump its progress, and return the exit code.
+
+    `proc_cb`, if given, receives the Popen right after spawn (for Cancel).
+    """
+    proc = subprocess.Popen(
+        cmd, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, bufsize=0,
+        close_fds=True, cwd=cwd, **_popen_kwargs(),
+    )
+    if proc_cb:
+        proc_cb(proc)
+    if proc.stderr is not None:
+        if hasattr(select, "poll"):
+            _pump_progress_poll(proc.stderr, progress_cb)
+        else:
+            _pump_progress_thread(proc.stderr, progress_cb)
+    return proc.wait()
+
+
+def run_ffmpeg(video: str, en_srt: str, vi_srt: str, out_path: str, mode: str, downscale_720: bool, font_size: int, en_margin: int, vi_margin: int, progress_cb=None, status_cb=None, preset: str = "", proc_cb=None) -> int:
     ffmpeg = ffmpeg_path_guess()
-    filter_complex = build_filter_complex(en_srt, vi_srt, downscale_720, font_size, en_margin, vi_margin)
-    v_args, a_args = build_encode_args(mode)
+
+    if mode.lower() == "soft-mux":
+        # No re-encode at all: copy the video/audio packets and add both SRTs
+        # as mov_text tracks. Runs at I/O speed; players must support embedded
+        # mov_text to show the subtitles.
+        if status_cb:
+            status_cb("soft-mux: stream copy, no re-encode")
+        cmd = [
+            ffmpeg, "-y",
+            "-i", video, "-i", en_srt, "-i", vi_srt,
+            "-map", "0:v", "-map", "0:a?", "-map", "1", "-map", "2",
+            "-c:v", "copy", "-c:a", "copy", "-c:s", "mov_text",
+            "-metadata:s:s:0", "language=eng",
+            "-metadata:s:s:1", "language=vie",
+            "-movflags", MOV_FLAGS,
+            out_path,
+        ]
+        return _run_ffmpeg_cmd(cmd, progress_cb, proc_cb)
+
+    v_args, a_args = build_encode_args(mode, preset)
+
+    # Offload decode too when we are encoding on hardware; with NVENC keep the
+    # decoded frames in CUDA memory so scaling stays on-device.
+    encoder = v_args[1]
+    use_cuda = encoder.endswith("_nvenc")
+    if use_cuda:
+        hw_args = ["-hwaccel", "cuda", "-hwaccel_output_format", "cuda"]
+    elif not encoder.startswith("lib"):
+        hw_args = ["-hwaccel", "auto"]
+    else:
+        hw_args = []
+
+    # Embedded EN/VI tracks in an MKV can be burned straight from the container.
+    cwd = None
+    embedded = None
+    if Path(video).suffix.lower() == ".mkv" and not (en_srt and vi_srt):
+        embedded = probe_embedded_subtitles(video)
+    if embedded:
+        ass_path = None
+        filter_complex = build_embedded_filter_complex(video, *embedded, downscale_720, font_size, en_margin, vi_margin, cuda=use_cuda)
+    else:
+        ass_path = merge_srts_to_ass(en_srt, vi_srt, font_size, en_margin, vi_margin)
+        ass_ref = ass_path
+        if platform.system() == "Windows" and len(ass_path) > 200:
+            # Long temp paths eat into the ~32 KiB argv limit; run FFmpeg from
+            # the temp dir and reference the file by name instead.
+            cwd = str(Path(ass_path).parent)
+            ass_ref = Path(ass_path).name
+        filter_complex = build_filter_complex(ass_ref, downscale_720, cuda=use_cuda)
+
+    # Skip the audio transcode (and its generation loss) when the source is
+    # already AAC at or below the target bitrate.
+    codec, bitrate = probe_audio(video)
+    target_bps = int(a_args[-1].rstrip("k")) * 1000
+    if codec == "aac" and bitrate is not None and bitrate <= target_bps:
+        a_args = ["-c:a", "copy"]
+        audio_note = "audio: copy"
+    else:
+        audio_note = f"audio: aac {a_args[-1]}"
+    if status_cb:
+        status_cb(audio_note)
 
     cmd = [
         ffmpeg,
         "-y",
+        *hw_args,
         "-i", video,
         "-filter_complex", filter_complex,
         "-map", "[vout]",
         "-map", "0:a?",
         *v_args,
         *a_args,
-        "-movflags", "+faststart",
+        "-movflags", MOV_FLAGS,
         out_path,
     ]
 
-    proc = subprocess.Popen(cmd, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True, bufsize=1)
-    if progress_cb and proc.stderr is not None:
-        for line in proc.stderr:
-            if "time=" in line:
-                try:
-                    t = line.split("time=")[1].split()[0]
-                    progress_cb(t)
-                except Exception:
-                    pass
-    return proc.wait()
+    try:
+        return _run_ffmpeg_cmd(cmd, progress_cb, proc_cb, cwd=cwd)
+    finally:
+        if ass_path:
+            try:
+                os.remove(ass_path)
+            except OSError:
+                pass
 
 
 # ======= GUI =======
@@ -135,13 +545,32 @@ class App(TkBase):
         self.out_dir = tk.StringVar(value=str(Path.home()))
         self.status_text = tk.StringVar(value="Drop files or click Browse…")
         self.mode = tk.StringVar(value="Smaller")
+        self.preset = tk.StringVar(value="Auto")
         self.downscale = tk.BooleanVar(value=False)
         # UI-controlled subtitle parameters
         self.font_size_var = tk.IntVar(value=24)
         self.en_margin_var = tk.IntVar(value=60)
         self.vi_margin_var = tk.IntVar(value=24)
 
+        # Tk is not thread-safe: the FFmpeg worker posts callables here and the
+        # main loop applies them via _drain_ui_queue.
+        self._ui_queue = queue.Queue()
+        self._proc = None  # running FFmpeg Popen, for Cancel
+
         self._build_ui()
+        self.after(50, self._drain_ui_queue)
+
+    def _post_ui(self, fn):
+        """Schedule a callable to run on the Tk main thread."""
+        self._ui_queue.put(fn)
+
+    def _drain_ui_queue(self):
+        try:
+            while True:
+                self._ui_queue.get_nowait()()
+        except queue.Empty:
+            pass
+        self.after(50, self._drain_ui_queue)
 
     def _build_ui(self):
         main = ttk.Frame(self, padding=16)
@@ -178,8 +607,11 @@ class App(TkBase):
         opts = ttk.LabelFrame(main, text="Compression")
         opts.pack(fill=tk.X, pady=(8, 8))
         ttk.Label(opts, text="Mode:").pack(side=tk.LEFT, padx=(8, 6))
-        mode_box = ttk.Combobox(opts, textvariable=self.mode, values=["Normal", "Smaller", "Smallest"], state="readonly", width=12)
+        mode_box = ttk.Combobox(opts, textvariable=self.mode, values=["Normal", "Smaller", "Smallest", "Soft-mux"], state="readonly", width=12)
         mode_box.pack(side=tk.LEFT)
+        ttk.Label(opts, text="Preset:").pack(side=tk.LEFT, padx=(12, 6))
+        preset_box = ttk.Combobox(opts, textvariable=self.preset, values=["Auto", *SW_PRESETS], state="readonly", width=10)
+        preset_box.pack(side=tk.LEFT)
         ttk.Checkbutton(opts, text="Downscale to 720p", variable=self.downscale).pack(side=tk.LEFT, padx=12)
 
         # Subtitle appearance
@@ -195,34 +627,16 @@ class App(TkBase):
         # Progress + Action
         action = ttk.Frame(main)
         action.pack(fill=tk.X, pady=(8, 4))
-        self.progress = ttk.Progressbar(action, mode="indeterminate")
+        self.progress = ttk.Progressbar(action, mode="determinate", maximum=1000)
         self.progress.pack(fill=tk.X, side=tk.LEFT, expand=True)
         ttk.Button(action, text="Embed Subtitles", command=self._start).pack(side=tk.LEFT, padx=8)
+        ttk.Button(action, text="Cancel", command=self._cancel).pack(side=tk.LEFT)
 
         ttk.Label(main, textvariable=self.status_text, foreground="#444").pack(anchor=tk.W, pady=(6, 0))
 
     # ----- DnD helpers -----
     def _parse_dnd_list(self, data: str):
-        items = []
-        token = ''
-        in_brace = False
-        for ch in data:
-            if ch == '{':
-                in_brace = True
-                token = ''
-            elif ch == '}':
-                in_brace = False
-                items.append(token)
-                token = ''
-            elif ch == ' ' and not in_brace:
-                if token:
-                    items.append(token)
-                    token = ''
-            else:
-                token += ch
-        if token:
-            items.append(token)
-        return items
+        return [a or b for a, b in _DND_TOKEN.findall(data)]
 
     def _on_multi_drop(self, event):
         paths = self._parse_dnd_list(event.data)
@@ -236,10 +650,13 @@ class App(TkBase):
             ext = Path(p).suffix.lower()
             if ext in VID_EXTS:
                 self.video_path.set(p)
+                if ext == ".mkv" and probe_embedded_subtitles(p):
+                    self.status_text.set("Embedded EN/VI subtitle tracks detected — SRT files are optional.")
             elif ext == ".srt":
-                # heuristic: if name hints VI, set to VI
+                # Content beats filename: Vietnamese diacritics identify the
+                # VI track; fall back to name hints for undecorated files.
                 name = Path(p).name.lower()
-                if any(k in name for k in ["vi", "viet", "vietnam"]):
+                if srt_is_vietnamese(p) or any(k in name for k in ["vi", "viet", "vietnam"]):
                     self.vi_srt_path.set(p)
                 elif not self.en_srt_path.get():
                     self.en_srt_path.set(p)
@@ -292,9 +709,27 @@ class App(TkBase):
         vi = self.vi_srt_path.get().strip()
         out_dir = self.out_dir.get().strip()
 
-        if not all(map(os.path.isfile, [video, en, vi])):
-            messagebox.showerror("Missing file", "Please select a valid video and two SRT files.")
+        if not os.path.isfile(video):
+            messagebox.showerror("Missing file", "Please select a valid video file.")
             return
+        if not all(map(os.path.isfile, [en, vi])):
+            # An MKV carrying its own EN/VI tracks needs no external SRTs
+            # (burn-in only; Soft-mux muxes the SRT files themselves).
+            if self.mode.get() == "Soft-mux" or not (Path(video).suffix.lower() == ".mkv" and probe_embedded_subtitles(video)):
+                messagebox.showerror("Missing file", "Please select two SRT files (or an MKV with embedded EN/VI tracks).")
+                return
+            en = vi = ""
+        if en and vi:
+            # Fail fast on malformed files instead of minutes into the encode.
+            for label, srt in (("English", en), ("Vietnamese", vi)):
+                if not srt_looks_valid(srt):
+                    messagebox.showerror("Invalid SRT", f"{label} subtitle file does not look like an SRT:\n{srt}")
+                    return
+            # Roles mixed up? The diacritic scan is more reliable than filenames.
+            if srt_is_vietnamese(en) and not srt_is_vietnamese(vi):
+                en, vi = vi, en
+                self.en_srt_path.set(en)
+                self.vi_srt_path.set(vi)
         if not os.path.isdir(out_dir):
             messagebox.showerror("Missing folder", "Please choose a valid output folder.")
             return
@@ -303,25 +738,61 @@ class App(TkBase):
         out_path = str(Path(out_dir) / f"{base}_dual_subbed.mp4")
 
         self.status_text.set("Starting FFmpeg…")
-        self.progress.start(12)
+        self.progress["value"] = 0
         threading.Thread(
             target=self._run_embed,
-            args=(video, en, vi, out_path, self.mode.get(), self.downscale.get(), self.font_size_var.get(), self.en_margin_var.get(), self.vi_margin_var.get()),
+            args=(video, en, vi, out_path, self.mode.get(), self.downscale.get(), self.font_size_var.get(), self.en_margin_var.get(), self.vi_margin_var.get(), self.preset.get()),
             daemon=True,
         ).start()
 
-    def _run_embed(self, video, en, vi, out_path, mode, downscale, font_size, en_margin, vi_margin):
+    def _run_embed(self, video, en, vi, out_path, mode, downscale, font_size, en_margin, vi_margin, preset):
         start = time.time()
+        total = probe_duration(video)
+
+        def on_progress(ts):
+            cur = ffmpeg_time_to_seconds(ts)
+            pct = min(cur / total, 1.0) * 1000 if (total and cur is not None) else None
+
+            def apply(t=ts, p=pct):
+                self.status_text.set(f"Encoding… time={t}")
+                if p is not None:
+                    self.progress["value"] = p
+
+            self._post_ui(apply)
+
         try:
-            code = run_ffmpeg(video, en, vi, out_path, mode, downscale, font_size, en_margin, vi_margin, progress_cb=lambda ts: self.status_text.set(f"Encoding… time={ts}"))
+            code = run_ffmpeg(
+                video, en, vi, out_path, mode, downscale, font_size, en_margin, vi_margin,
+                preset=preset,
+                progress_cb=on_progress,
+                status_cb=lambda note: self._post_ui(lambda n=note: self.status_text.set(f"Encoding… ({n})")),
+                proc_cb=lambda p: setattr(self, "_proc", p),
+            )
         except Exception as e:
-            self._finish(False, start, msg=str(e))
+            msg = str(e)
+            self._post_ui(lambda: self._finish(False, start, msg=msg))
             return
+        finally:
+            self._proc = None
         ok = (code == 0 and os.path.exists(out_path))
-        self._finish(ok, start, out_path)
+        self._post_ui(lambda: self._finish(ok, start, out_path))
+
+    def _cancel(self):
+        proc = self._proc
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            if platform.system() == "Windows":
+                proc.terminate()
+            else:
+                # SIGINT lets FFmpeg flush and close the output file cleanly.
+                proc.send_signal(signal.SIGINT)
+        except Exception:
+            pass
+        self.status_text.set("Cancelling…")
 
     def _finish(self, ok, start, out_path="", msg=""):
-        self.progress.stop()
+        self.progress["value"] = 1000 if ok else 0
         if ok:
             dur = time.time() - start
             self.status_text.set(f"Done in {dur:.1f}s → {out_path}")